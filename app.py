@@ -4,37 +4,324 @@ Mouse and Keyboard Macro Recorder with Flask Web Interface
 A comprehensive application for recording and replaying mouse/keyboard actions
 """
 
-import json
+import asyncio
+import atexit
+import gzip
+import io
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import struct
 import time
 import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from multiprocessing.shared_memory import SharedMemory
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import Annotated, List, Dict, Any, Optional, Iterator, Tuple, Callable, Union
 
+import msgspec
+import numpy as np
+import orjson
+try:
+    from numba import njit
+except ImportError:  # Optional: kernels fall back to numpy / plain Python
+    njit = None
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within the process
+    fcntl = None
 import pynput
 from pynput import mouse, keyboard
-from flask import Flask, render_template_string, request, jsonify, send_file
+from flask import Flask, Response, request, jsonify, render_template, send_file, stream_with_context
+from flask.json.provider import DefaultJSONProvider
 import signal
 import sys
 
+# Event type codes used by the columnar event store
+MOVE, CLICK, SCROLL, KDOWN, KUP = 0, 1, 2, 3, 4
+EVENT_TYPES = ('mouse_move', 'mouse_click', 'mouse_scroll', 'key_press', 'key_release')
+
+EVENT_CODES = {name: code for code, name in enumerate(EVENT_TYPES)}
+# Incoming events may tag their type by name or by code
+EVENT_CODES.update({code: code for code in range(len(EVENT_TYPES))})
+
+# Mouse buttons are recorded as their index in this tuple
+BUTTONS = tuple(mouse.Button)
+BUTTON_IDS = {button: i for i, button in enumerate(BUTTONS)}
+BUTTON_NAMES = [str(button) for button in BUTTONS]
+
+# Column name -> dtype of the struct-of-arrays event layout. Timestamps are
+# nanoseconds from the start of the recording; keys and buttons are indexes
+# into the name tables stored next to the columns; repeat counts the
+# autorepeat presses merged into a key press.
+COLUMNS = {
+    'ts': 'i8',
+    'type': 'u1',
+    'x': 'i4',
+    'y': 'i4',
+    'button': 'u1',
+    'pressed': '?',
+    'key': 'i4',
+    'dx': 'i4',
+    'dy': 'i4',
+    'repeat': 'i4',
+}
+
+def elevate_thread_priority():
+    """Give the calling thread real-time priority and, once granted, pin it
+    to the last available CPU. Best effort: unprivileged runs keep the
+    default scheduling and CPU set."""
+    if sys.platform.startswith('linux'):
+        # On Linux, pid 0 refers to the calling thread
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(20))
+        except (AttributeError, OSError):
+            # Pinning without real-time priority only narrows where the
+            # scheduler may run the thread
+            return
+        try:
+            os.sched_setaffinity(0, {max(os.sched_getaffinity(0))})
+        except (AttributeError, OSError, ValueError):
+            pass
+    elif sys.platform == 'win32':
+        try:
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            THREAD_PRIORITY_TIME_CRITICAL = 15
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_TIME_CRITICAL)
+        except Exception:
+            pass
+
+def _jit(func):
+    """Compile a numeric kernel with Numba when it is installed"""
+    return njit(cache=True)(func) if njit else func
+
+def _decimate_moves_numpy(ts, x, y, types, dt_ns, dpx):
+    """Keep-mask for _decimate_moves, used without Numba. The candidates are
+    found vectorized; only they are walked in order, since whether a move is
+    dropped depends on which move was last kept."""
+    n = len(ts)
+    keep = np.ones(n, dtype=np.bool_)
+    if n < 3:
+        return keep
+    is_move = types == MOVE
+    # Only moves with a move on both sides are candidates
+    candidates = np.flatnonzero(is_move[1:-1] & is_move[:-2] & is_move[2:]) + 1
+    
+    ts, x, y = ts.tolist(), x.tolist(), y.tolist()
+    limit = dpx * dpx
+    last = prev = -1
+    for i in candidates.tolist():
+        if i - 1 != prev:
+            # The row before a run of candidates is always kept
+            last = i - 1
+        prev = i
+        ddx = x[i] - x[last]
+        ddy = y[i] - y[last]
+        if ts[i] - ts[last] < dt_ns and ddx * ddx + ddy * ddy < limit:
+            keep[i] = False
+        else:
+            last = i
+    return keep
+
+@_jit
+def _decimate_moves_loop(ts, x, y, types, dt_ns, dpx):
+    """Single-pass keep-mask for _decimate_moves, compiled by Numba"""
+    n = len(ts)
+    keep = np.ones(n, dtype=np.bool_)
+    limit = dpx * dpx
+    last = 0
+    for i in range(1, n - 1):
+        if types[i] == MOVE and types[i - 1] == MOVE and types[i + 1] == MOVE \
+           and ts[i] - ts[last] < dt_ns:
+            ddx = float(x[i] - x[last])
+            ddy = float(y[i] - y[last])
+            if ddx * ddx + ddy * ddy < limit:
+                keep[i] = False
+                continue
+        last = i
+    return keep
+
+# Mask of rows to keep when a move is within dt_ns and dpx of the last kept move
+_decimate_moves = _decimate_moves_loop if njit else _decimate_moves_numpy
+
+@_jit
+def _coalesce_moves(offsets, types, window_ns):
+    """Mask of rows to keep when dropping a move whose following move lands
+    within window_ns of the previously kept row. The last move of every run
+    is kept."""
+    n = len(offsets)
+    keep = np.ones(n, dtype=np.bool_)
+    last = -(1 << 62)
+    for i in range(n):
+        if types[i] == MOVE and i + 1 < n and types[i + 1] == MOVE \
+           and offsets[i + 1] - last < window_ns:
+            keep[i] = False
+        else:
+            last = offsets[i]
+    return keep
+
+class EventTable:
+    """Schema-uniform events stored as typed columns"""
+    
+    def __init__(self, columns: Dict[str, np.ndarray], keys: List[Optional[str]], buttons: List[str]):
+        self.columns = columns
+        self.keys = keys
+        self.buttons = buttons
+    
+    @classmethod
+    def from_events(cls, events: List[Dict[str, Any]]) -> 'EventTable':
+        """Pack event dicts into columns"""
+        if isinstance(events, cls):
+            return events
+        
+        rows = {name: [] for name in COLUMNS}
+        key_ids: Dict[Optional[str], int] = {}
+        button_ids: Dict[str, int] = {}
+        for event in events:
+            type_code = EVENT_CODES[event['type']]
+            rows['ts'].append(round(event['timestamp'] * 1e9))
+            rows['type'].append(type_code)
+            rows['x'].append(event.get('x', 0))
+            rows['y'].append(event.get('y', 0))
+            rows['button'].append(button_ids.setdefault(event['button'], len(button_ids))
+                                  if type_code == CLICK else 0)
+            rows['pressed'].append(event.get('pressed', False))
+            rows['key'].append(key_ids.setdefault(event['key'], len(key_ids))
+                               if type_code in (KDOWN, KUP) else 0)
+            rows['dx'].append(event.get('dx', 0))
+            rows['dy'].append(event.get('dy', 0))
+            rows['repeat'].append(event.get('repeat', 0))
+        
+        columns = {name: np.array(rows[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+        return cls(columns, list(key_ids), list(button_ids))
+    
+    @classmethod
+    def from_columns(cls, payload: Dict[str, Any]) -> 'EventTable':
+        """Rebuild a table from the columnar wire format"""
+        data = payload['columns']
+        n = len(data['ts'])
+        columns = {name: np.asarray(data[name], dtype=dtype) if name in data else np.zeros(n, dtype)
+                   for name, dtype in COLUMNS.items()}
+        types = payload.get('types')
+        if types is not None and tuple(types) != EVENT_TYPES:
+            # Sender numbered the types differently; translate to our codes
+            lut = np.array([EVENT_CODES[name] for name in types], dtype=COLUMNS['type'])
+            columns['type'] = lut[columns['type']]
+        return cls(columns, payload.get('keys', []), payload.get('buttons', BUTTON_NAMES))
+    
+    def to_columns(self) -> Dict[str, Any]:
+        """Columnar wire format: one array per field, the key and button tables
+        and the type code schema"""
+        return {'columns': self.columns, 'keys': self.keys, 'buttons': self.buttons,
+                'types': EVENT_TYPES}
+    
+    def __len__(self) -> int:
+        return len(self.columns['ts'])
+    
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Yield event dicts one row at a time"""
+        columns = self.columns
+        for ts, type_code, x, y, button, pressed, key, dx, dy, repeat in zip(
+                *(columns[name].tolist() for name in COLUMNS)):
+            event = {'type': EVENT_TYPES[type_code], 'timestamp': ts / 1e9}
+            if type_code in (KDOWN, KUP):
+                event['key'] = self.keys[key]
+                if repeat:
+                    event['repeat'] = repeat
+            else:
+                event['x'] = x
+                event['y'] = y
+                if type_code == CLICK:
+                    event['button'] = self.buttons[button]
+                    event['pressed'] = pressed
+                elif type_code == SCROLL:
+                    event['dx'] = dx
+                    event['dy'] = dy
+            yield event
+
 class MacroRecorder:
     """Handles recording of mouse and keyboard events"""
     
-    def __init__(self):
-        self.events: List[Dict[str, Any]] = []
+    # Attribute name -> dtype of the recorder's event columns
+    _COLUMNS = {'_' + name: dtype for name, dtype in COLUMNS.items()}
+    
+    # Slots in the callback -> drainer ring buffer (power of two)
+    RING_SIZE = 1 << 14
+    
+    # A mouse move is stored only once it is this far (Manhattan pixels) or
+    # this long after the last stored move
+    MOVE_MIN_PX = 3
+    MOVE_MIN_NS = 16_000_000
+    
+    def __init__(self, capacity: int = 4096, count_changed=None, shared_count=None):
         self.recording = False
-        self.start_time = None
+        self._start_ns = 0
         self.mouse_listener = None
         self.keyboard_listener = None
+        
+        # Preallocated event columns, doubled on overflow
+        self._cap = capacity
+        self._n = 0
+        for name, dtype in self._COLUMNS.items():
+            setattr(self, name, np.empty(self._cap, dtype))
+        
+        # Interning table for key strings
+        self._key_ids: Dict[Optional[str], int] = {}
+        self._key_names: List[Optional[str]] = []
+        
+        # Row of the last key press or release; a press right after a press
+        # of the same key is the OS autorepeating it
+        self._last_key_row = -1
+        
+        # (timestamp, x, y) of the last stored move, and of the latest move
+        # held back by the debounce
+        self._last_move: Optional[Tuple[int, int, int]] = None
+        self._pending_move: Optional[Tuple[int, int, int]] = None
+        
+        # Ring buffer filled by the listener callbacks and emptied by the
+        # drainer thread. Each row is (type, timestamp, x, y, a, b); a row is
+        # published by writing seq + 1 into its commit marker.
+        self._ring = np.zeros((self.RING_SIZE, 6), dtype=np.int64)
+        self._ring_seq = np.zeros(self.RING_SIZE, dtype=np.int64)
+        self._ring_mask = self.RING_SIZE - 1
+        self._next_seq = itertools.count().__next__
+        self._tail = 0
+        self._ring_ready = threading.Event()
+        self._draining = False
+        self._drain_thread = None
+        
+        # Set every few stored events so listeners can push the new count.
+        # The engine process passes a multiprocessing Event and Value here so
+        # the web process can follow the count without a round trip.
+        self._count_changed = count_changed or threading.Event()
+        self._shared_count = shared_count
     
     def start_recording(self):
         """Start recording mouse and keyboard events"""
         if self.recording:
             return False
         
-        self.events.clear()
+        self._set_count(0)
+        self._key_ids.clear()
+        self._key_names.clear()
+        self._last_key_row = -1
+        self._last_move = None
+        self._pending_move = None
+        self._ring_seq.fill(0)
+        self._next_seq = itertools.count().__next__
+        self._tail = 0
+        self._ring_ready.clear()
         self.recording = True
-        self.start_time = time.time()
+        self._start_ns = time.monotonic_ns()
+        
+        # Start the drainer before the listeners so no event waits on it
+        self._draining = True
+        self._drain_thread = threading.Thread(target=self._drain, daemon=True)
+        self._drain_thread.start()
         
         # Start mouse listener
         self.mouse_listener = mouse.Listener(
@@ -67,85 +354,259 @@ class MacroRecorder:
         if self.keyboard_listener:
             self.keyboard_listener.stop()
         
-        print(f"Recording stopped. Captured {len(self.events)} events.")
+        # Let the drainer flush whatever is left in the ring buffer
+        self._draining = False
+        self._ring_ready.set()
+        if self._drain_thread:
+            self._drain_thread.join()
+        
+        self.compact_moves()
+        self._count_changed.set()
+        
+        print(f"Recording stopped. Captured {self._n} events.")
         return True
     
-    def get_events(self):
-        """Get current recorded events"""
-        return self.events.copy()
+    def compact_moves(self, dt: float = 0.05, dpx: float = 3) -> int:
+        """Drop mouse moves that are close to the last kept move in both time
+        and distance. The first and last move of each run are always kept.
+        Returns the number of events removed."""
+        n = self._n
+        if n < 3:
+            return 0
+        
+        keep = _decimate_moves(self._ts[:n], self._x[:n], self._y[:n], self._type[:n],
+                               int(dt * 1e9), float(dpx))
+        kept = int(keep.sum())
+        if kept < n:
+            for name in self._COLUMNS:
+                column = getattr(self, name)
+                column[:kept] = column[:n][keep]
+            self._set_count(kept)
+        return n - kept
+    
+    def get_event_count(self) -> int:
+        """Get number of recorded events"""
+        return self._n
+    
+    def get_events(self) -> Dict[str, np.ndarray]:
+        """Get read-only, zero-copy views of the recorded columns. The views
+        are only valid until the next recording starts.
+        
+        Safe to call while recording without a lock: the drainer writes a row
+        before bumping the count and growth copies existing rows, so slicing
+        every column at one snapshot of the count sees only complete rows."""
+        n = self._n
+        views = {}
+        for name in self._COLUMNS:
+            view = getattr(self, name)[:n]
+            view.flags.writeable = False
+            views[name[1:]] = view
+        return views
     
-    def _get_timestamp(self):
-        """Get relative timestamp from start of recording"""
-        return time.time() - self.start_time if self.start_time else 0
+    def get_key_names(self) -> List[Optional[str]]:
+        """Get the key table the recorded key column indexes into"""
+        return list(self._key_names)
+    
+    def get_table(self) -> EventTable:
+        """Get a copy of the recorded columns"""
+        columns = {name: view.copy() for name, view in self.get_events().items()}
+        return EventTable(columns, self.get_key_names(), BUTTON_NAMES)
+    
+    def _push(self, type_code, x=0, y=0, a=0, b=0):
+        """Publish a raw event to the ring buffer (runs on the listener thread)"""
+        timestamp = time.monotonic_ns() - self._start_ns
+        # next() on itertools.count is atomic under the GIL, so the mouse and
+        # keyboard listeners can share the ring without a lock
+        seq = self._next_seq()
+        while seq - self._tail >= self.RING_SIZE:
+            # Ring is full: wait for the drainer rather than overwrite a row
+            time.sleep(0.001)
+        
+        idx = seq & self._ring_mask
+        self._ring[idx] = (type_code, timestamp, x, y, a, b)
+        self._ring_seq[idx] = seq + 1
+        ready = self._ring_ready
+        if not ready.is_set():
+            ready.set()
+    
+    def _drain(self):
+        """Move events from the ring buffer into the column store"""
+        elevate_thread_priority()
+        ring = self._ring
+        ring_seq = self._ring_seq
+        mask = self._ring_mask
+        
+        while True:
+            self._ring_ready.wait()
+            self._ring_ready.clear()
+            
+            tail = self._tail
+            while ring_seq[tail & mask] == tail + 1:
+                self._ingest(*ring[tail & mask].tolist())
+                tail += 1
+                self._tail = tail
+            
+            if not self._draining:
+                break
+        
+        self._flush_pending_move()
+    
+    def _ingest(self, type_code, timestamp, x, y, a, b):
+        """Apply recording filters to a raw event and store it"""
+        if type_code == MOVE:
+            last = self._last_move
+            if (last is not None and abs(x - last[1]) + abs(y - last[2]) < self.MOVE_MIN_PX
+                    and timestamp - last[0] < self.MOVE_MIN_NS):
+                self._pending_move = (timestamp, x, y)
+                return
+            self._pending_move = None
+            self._last_move = (timestamp, x, y)
+            self._append_row(MOVE, timestamp, x, y)
+            return
+        
+        # The pointer's final position before any other event is never dropped
+        self._flush_pending_move()
+        if type_code == CLICK:
+            self._append_row(CLICK, timestamp, x, y, button=a, pressed=b)
+        elif type_code == SCROLL:
+            self._append_row(SCROLL, timestamp, x, y, dx=a, dy=b)
+        elif type_code == KDOWN:
+            row = self._last_key_row
+            if row >= 0 and self._type[row] == KDOWN and self._key[row] == a:
+                # Autorepeat of a held key: count it on the original press
+                self._repeat[row] += 1
+                return
+            self._last_key_row = self._n
+            self._append_row(KDOWN, timestamp, key=a)
+        else:
+            # Releases are matched by position, not key: pynput may report a
+            # shifted key's release under a different char than its press
+            self._last_key_row = self._n
+            self._append_row(KUP, timestamp, key=a)
+    
+    def _flush_pending_move(self):
+        """Store the move held back by the debounce, if any"""
+        pending = self._pending_move
+        if pending is not None:
+            self._pending_move = None
+            self._last_move = pending
+            self._append_row(MOVE, *pending)
+    
+    def _append_row(self, type_code, timestamp, x=0, y=0, button=0, pressed=False, key=0, dx=0, dy=0, repeat=0):
+        """Write one event into the next free row, growing the columns if full"""
+        n = self._n
+        if n == self._cap:
+            self._cap *= 2
+            for name in self._COLUMNS:
+                setattr(self, name, np.resize(getattr(self, name), self._cap))
+        
+        self._ts[n] = timestamp
+        self._type[n] = type_code
+        self._x[n] = x
+        self._y[n] = y
+        self._button[n] = button
+        self._pressed[n] = pressed
+        self._key[n] = key
+        self._dx[n] = dx
+        self._dy[n] = dy
+        self._repeat[n] = repeat
+        self._set_count(n + 1)
+        
+        if not self._n & 15:
+            self._count_changed.set()
+    
+    def _set_count(self, n: int):
+        """Update the number of stored rows"""
+        self._n = n
+        if self._shared_count is not None:
+            self._shared_count.value = n
+    
+    def _intern_key(self, key) -> int:
+        """Map a pynput key to its id in the key table"""
+        try:
+            key_char = key.char
+        except AttributeError:
+            key_char = str(key)
+        
+        key_id = self._key_ids.get(key_char)
+        if key_id is None:
+            key_id = self._key_ids[key_char] = len(self._key_names)
+            self._key_names.append(key_char)
+        return key_id
     
     def _on_mouse_click(self, x, y, button, pressed):
         """Handle mouse click events"""
         if self.recording:
-            self.events.append({
-                'type': 'mouse_click',
-                'timestamp': self._get_timestamp(),
-                'x': x,
-                'y': y,
-                'button': str(button),
-                'pressed': pressed
-            })
+            self._push(CLICK, x, y, BUTTON_IDS[button], pressed)
     
     def _on_mouse_move(self, x, y):
-        """Handle mouse move events (throttled)"""
+        """Handle mouse move events"""
         if self.recording:
-            # Only record significant movements to avoid too many events
-            if not self.events or self.events[-1]['type'] != 'mouse_move' or \
-               self._get_timestamp() - self.events[-1]['timestamp'] > 0.1:
-                self.events.append({
-                    'type': 'mouse_move',
-                    'timestamp': self._get_timestamp(),
-                    'x': x,
-                    'y': y
-                })
+            self._push(MOVE, x, y)
     
     def _on_mouse_scroll(self, x, y, dx, dy):
         """Handle mouse scroll events"""
         if self.recording:
-            self.events.append({
-                'type': 'mouse_scroll',
-                'timestamp': self._get_timestamp(),
-                'x': x,
-                'y': y,
-                'dx': dx,
-                'dy': dy
-            })
+            self._push(SCROLL, x, y, dx, dy)
     
     def _on_key_press(self, key):
         """Handle key press events"""
         if self.recording:
-            try:
-                key_char = key.char
-            except AttributeError:
-                key_char = str(key)
-            
-            self.events.append({
-                'type': 'key_press',
-                'timestamp': self._get_timestamp(),
-                'key': key_char
-            })
+            self._push(KDOWN, a=self._intern_key(key))
     
     def _on_key_release(self, key):
         """Handle key release events"""
         if self.recording:
-            try:
-                key_char = key.char
-            except AttributeError:
-                key_char = str(key)
-            
-            self.events.append({
-                'type': 'key_release',
-                'timestamp': self._get_timestamp(),
-                'key': key_char
-            })
+            self._push(KUP, a=self._intern_key(key))
+
+# Resolved pynput buttons and keys, keyed by their recorded string
+_BUTTON_CACHE: Dict[str, mouse.Button] = {}
+_KEY_CACHE: Dict[str, Any] = {}
+
+def _resolve_button(name: str) -> Optional[mouse.Button]:
+    """Map a recorded button string such as 'Button.left' to its pynput button"""
+    button = _BUTTON_CACHE.get(name)
+    if button is None:
+        button = getattr(mouse.Button, name.split('.')[-1], None)
+        if button is not None:
+            _BUTTON_CACHE[name] = button
+    return button
+
+def _resolve_key(key_str: Optional[str]):
+    """Parse a recorded key string back to a pynput key"""
+    if key_str is None:
+        return None
+    
+    key = _KEY_CACHE.get(key_str)
+    if key is None:
+        key = key_str
+        # Handle special keys
+        if len(key_str) > 1 and key_str.startswith('Key.'):
+            key = getattr(keyboard.Key, key_str[4:], key_str)
+        _KEY_CACHE[key_str] = key
+    return key
 
 class MacroPlayer:
     """Handles playback of recorded macros"""
     
+    # Playback opcodes, indexes into self._dispatch
+    OP_MOVE, OP_BUTTON_DOWN, OP_BUTTON_UP, OP_SCROLL, OP_KEY_DOWN, OP_KEY_UP = range(6)
+    
+    # Busy-wait for the last stretch before a deadline for sub-ms accuracy
+    SPIN_NS = 500_000
+    
+    # Moves closer together than one pointer refresh (125 Hz) are coalesced
+    COALESCE_NS = 8_000_000
+    
+    # Longer schedules use the dispatch loop. Compiling straight-line code
+    # costs ~30-50 µs per step up front and saves only ~0.1 µs per step per
+    # pass, so it breaks even after roughly 300-400 passes; in practice the
+    # generated path rarely pays for itself and only endless loops and very
+    # high repeat counts use it
+    CODEGEN_LIMIT = 2_000
+    CODEGEN_MIN_PASSES = 400
+    CODEGEN_CACHE_SIZE = 4
+    
     def __init__(self):
         self.mouse_controller = mouse.Controller()
         self.keyboard_controller = keyboard.Controller()
@@ -153,6 +614,15 @@ class MacroPlayer:
         self.loop_playing = False
         self.play_thread = None
         self.stop_listener = None
+        self._dispatch = (
+            self._op_move,
+            self._op_button_down,
+            self._op_button_up,
+            self._op_scroll,
+            self._op_key_down,
+            self._op_key_up
+        )
+        self._codegen_cache: Dict[tuple, Callable] = {}
     
     def play_macro(self, events: List[Dict[str, Any]], speed: float = 1.0, repeat: int = 1):
         """Play back recorded events"""
@@ -226,29 +696,27 @@ class MacroPlayer:
     
     def _play_events_loop(self, events: List[Dict[str, Any]], speed: float, delay_between_loops: float):
         """Internal method to play events in a loop"""
+        elevate_thread_priority()
         loop_count = 0
         try:
+            schedule = self._compile(events, speed)
+            # Only a cached run is used for the first pass, so playback starts
+            # at once; an open-ended loop then earns back the compile time
+            run = self._codegen(schedule, passes=0)
             while self.loop_playing and self.playing:
                 loop_count += 1
                 print(f"🔄 Loop iteration #{loop_count}")
                 
-                last_timestamp = 0
+                self._play_schedule(schedule, run)
                 
-                for event in events:
-                    if not self.loop_playing or not self.playing:
-                        break
-                    
-                    # Wait for the appropriate time
-                    wait_time = (event['timestamp'] - last_timestamp) / speed
-                    if wait_time > 0:
-                        time.sleep(wait_time)
-                    
-                    self._execute_event(event)
-                    last_timestamp = event['timestamp']
+                pause_start = time.monotonic()
+                if run is None:
+                    run = self._codegen(schedule, passes=float('inf'))
                 
-                # Wait between loop iterations
-                if self.loop_playing and self.playing and delay_between_loops > 0:
-                    time.sleep(delay_between_loops)
+                # Wait between loop iterations, less any time spent compiling
+                remaining = delay_between_loops - (time.monotonic() - pause_start)
+                if self.loop_playing and self.playing and remaining > 0:
+                    time.sleep(remaining)
         
         except Exception as e:
             print(f"Loop playback error: {e}")
@@ -270,92 +738,257 @@ class MacroPlayer:
     
     def _play_events(self, events: List[Dict[str, Any]], speed: float, repeat: int):
         """Internal method to play events"""
+        elevate_thread_priority()
         try:
+            schedule = self._compile(events, speed)
+            run = self._codegen(schedule, passes=repeat)
             for _ in range(repeat):
                 if not self.playing:
                     break
                 
-                last_timestamp = 0
-                
-                for event in events:
-                    if not self.playing:
-                        break
-                    
-                    # Wait for the appropriate time
-                    wait_time = (event['timestamp'] - last_timestamp) / speed
-                    if wait_time > 0:
-                        time.sleep(wait_time)
-                    
-                    self._execute_event(event)
-                    last_timestamp = event['timestamp']
+                self._play_schedule(schedule, run)
         
         except Exception as e:
             print(f"Playback error: {e}")
         finally:
             self.playing = False
     
-    def _execute_event(self, event: Dict[str, Any]):
-        """Execute a single event"""
-        try:
-            if event['type'] == 'mouse_click':
-                self.mouse_controller.position = (event['x'], event['y'])
-                button = getattr(mouse.Button, event['button'].split('.')[-1])
-                if event['pressed']:
-                    self.mouse_controller.press(button)
-                else:
-                    self.mouse_controller.release(button)
-            
-            elif event['type'] == 'mouse_move':
-                self.mouse_controller.position = (event['x'], event['y'])
-            
-            elif event['type'] == 'mouse_scroll':
-                self.mouse_controller.position = (event['x'], event['y'])
-                self.mouse_controller.scroll(event['dx'], event['dy'])
-            
-            elif event['type'] == 'key_press':
-                key = self._parse_key(event['key'])
-                self.keyboard_controller.press(key)
+    def _compile(self, events: List[Dict[str, Any]], speed: float) -> List[Tuple[int, int, Any, Any, Any]]:
+        """Precompute (offset_ns, opcode, a, b, c) playback steps for events,
+        where offset_ns is the step's deadline from the start of playback"""
+        if not speed > 0:
+            raise ValueError(f"Playback speed must be positive, got {speed}")
+        table = EventTable.from_events(events)
+        # Resolve every distinct button and key once
+        buttons = [_resolve_button(name) for name in table.buttons]
+        keys = [_resolve_key(key_str) for key_str in table.keys]
+        
+        columns = table.columns
+        offsets = (columns['ts'] / speed).astype(np.int64)
+        keep = _coalesce_moves(offsets, columns['type'], self.COALESCE_NS)
+        
+        repeat_ends = self._repeat_ends(columns['type'], offsets)
+        
+        schedule = []
+        repeated = False
+        for offset_ns, type_code, x, y, button, pressed, key, dx, dy, repeat, repeat_end in zip(
+                offsets[keep].tolist(),
+                *(columns[name][keep].tolist() for name in COLUMNS if name != 'ts'),
+                repeat_ends[keep].tolist()):
+            if type_code == CLICK and buttons[button] is None:
+                print(f"Error executing event: unknown mouse button {table.buttons[button]}")
+                continue
             
-            elif event['type'] == 'key_release':
-                key = self._parse_key(event['key'])
-                self.keyboard_controller.release(key)
+            if type_code == MOVE:
+                schedule.append((offset_ns, self.OP_MOVE, x, y, None))
+            elif type_code == CLICK:
+                op = self.OP_BUTTON_DOWN if pressed else self.OP_BUTTON_UP
+                schedule.append((offset_ns, op, x, y, buttons[button]))
+            elif type_code == SCROLL:
+                schedule.append((offset_ns, self.OP_SCROLL, x, y, (dx, dy)))
+            elif type_code == KDOWN:
+                schedule.append((offset_ns, self.OP_KEY_DOWN, keys[key], None, None))
+                # Replay recorded autorepeats as presses spread evenly up to
+                # the next key event
+                for k in range(1, repeat + 1):
+                    repeat_ns = offset_ns + (repeat_end - offset_ns) * k // (repeat + 1)
+                    schedule.append((repeat_ns, self.OP_KEY_DOWN, keys[key], None, None))
+                repeated = repeated or repeat > 0
+            else:
+                schedule.append((offset_ns, self.OP_KEY_UP, keys[key], None, None))
         
-        except Exception as e:
-            print(f"Error executing event: {e}")
+        if repeated:
+            # Repeats sit right after their press and never pass the next key
+            # event, so a stable sort only interleaves them with mouse steps
+            schedule.sort(key=lambda step: step[0])
+        return schedule
+    
+    def _repeat_ends(self, types: np.ndarray, offsets: np.ndarray) -> np.ndarray:
+        """Offset of the next key event after each key row, or of the last
+        event for the final one. The recorder only merges an autorepeat while
+        its press is the latest key row, so every repeat happened before that
+        event, whichever key it was for."""
+        ends = np.zeros(len(offsets), dtype=np.int64)
+        key_rows = np.flatnonzero((types == KDOWN) | (types == KUP))
+        if len(key_rows):
+            ends[key_rows[:-1]] = offsets[key_rows[1:]]
+            ends[key_rows[-1]] = offsets[-1]
+        return ends
     
-    def _parse_key(self, key_str: str):
-        """Parse key string back to pynput key"""
-        if len(key_str) == 1:
-            return key_str
+    def _play_schedule(self, schedule: List[Tuple[int, int, Any, Any, Any]], run: Optional[Callable]):
+        """Play one pass of a compiled schedule, stopping early if playback is stopped"""
+        start_ns = time.monotonic_ns()
+        if run is not None:
+            run(self, start_ns)
+            return
         
-        # Handle special keys
-        if key_str.startswith('Key.'):
-            key_name = key_str.split('.')[-1]
-            return getattr(keyboard.Key, key_name, key_str)
+        dispatch = self._dispatch
+        for offset_ns, op, a, b, c in schedule:
+            if not self.playing:
+                break
+            
+            # Wait for the event's deadline
+            self._sleep_until(start_ns + offset_ns)
+            self._execute(dispatch[op], a, b, c)
+    
+    def _codegen(self, schedule: List[Tuple[int, int, Any, Any, Any]], passes: float) -> Optional[Callable]:
+        """Generate a straight-line function run(player, start_ns) that plays
+        the schedule without per-step dispatch. A cached function is always
+        reused; a new one is only generated when the schedule will be played
+        at least CODEGEN_MIN_PASSES times. Returns None otherwise and for
+        schedules over CODEGEN_LIMIT steps and empty ones."""
+        if not schedule or len(schedule) > self.CODEGEN_LIMIT:
+            return None
         
-        return key_str
-
+        cache_key = tuple(schedule)
+        run = self._codegen_cache.get(cache_key)
+        if run is not None or passes < self.CODEGEN_MIN_PASSES:
+            return run
+        
+        # Buttons and keys are passed in through K rather than as literals
+        constants: List[Any] = []
+        def const(value) -> str:
+            constants.append(value)
+            return f"K[{len(constants) - 1}]"
+        
+        lines = ["def run(player, start_ns):"]
+        for offset_ns, op, a, b, c in schedule:
+            if op == self.OP_MOVE:
+                action = f"mc.position = ({a!r}, {b!r})"
+            elif op == self.OP_BUTTON_DOWN:
+                action = f"mc.position = ({a!r}, {b!r}); mc.press({const(c)})"
+            elif op == self.OP_BUTTON_UP:
+                action = f"mc.position = ({a!r}, {b!r}); mc.release({const(c)})"
+            elif op == self.OP_SCROLL:
+                action = f"mc.position = ({a!r}, {b!r}); mc.scroll({c[0]!r}, {c[1]!r})"
+            elif op == self.OP_KEY_DOWN:
+                action = f"kc.press({const(a)})"
+            else:
+                action = f"kc.release({const(a)})"
+            lines += [
+                "    if not player.playing: return",
+                f"    sleep_until(start_ns + {offset_ns})",
+                f"    try: {action}",
+                "    except Exception as e: report(e)",
+            ]
+        
+        namespace = {
+            'mc': self.mouse_controller,
+            'kc': self.keyboard_controller,
+            'sleep_until': self._sleep_until,
+            'report': self._report_error,
+            'K': constants
+        }
+        exec(compile("\n".join(lines), "<macro>", "exec"), namespace)
+        run = namespace['run']
+        
+        if len(self._codegen_cache) >= self.CODEGEN_CACHE_SIZE:
+            self._codegen_cache.clear()
+        self._codegen_cache[cache_key] = run
+        return run
+    
+    def _sleep_until(self, deadline_ns: int):
+        """Sleep until an absolute monotonic deadline so delays never accumulate"""
+        remaining = deadline_ns - time.monotonic_ns()
+        if remaining > self.SPIN_NS:
+            time.sleep((remaining - self.SPIN_NS) / 1e9)
+        while time.monotonic_ns() < deadline_ns:
+            pass
+    
+    def _execute(self, handler, a, b, c):
+        """Execute a single playback step"""
+        try:
+            handler(a, b, c)
+        except Exception as e:
+            self._report_error(e)
+    
+    def _report_error(self, e: Exception):
+        print(f"Error executing event: {e}")
+    
+    def _op_move(self, x, y, _):
+        self.mouse_controller.position = (x, y)
+    
+    def _op_button_down(self, x, y, button):
+        self.mouse_controller.position = (x, y)
+        self.mouse_controller.press(button)
+    
+    def _op_button_up(self, x, y, button):
+        self.mouse_controller.position = (x, y)
+        self.mouse_controller.release(button)
+    
+    def _op_scroll(self, x, y, delta):
+        self.mouse_controller.position = (x, y)
+        self.mouse_controller.scroll(*delta)
+    
+    def _op_key_down(self, key, _, __):
+        self.keyboard_controller.press(key)
+    
+    def _op_key_up(self, key, _, __):
+        self.keyboard_controller.release(key)
+    
 class MacroManager:
     """Manages saving and loading of macros"""
     
+    # Binary macro file: magic, little-endian uint32 header length, JSON
+    # header, then the event columns as an .npz archive
+    MCR_MAGIC = b'MCR1'
+    MCR_PREFIX = struct.Struct('<4sI')
+    
+    # Macros with more events than this are compressed on disk
+    COMPRESS_THRESHOLD = 10_000
+    GZIP_MAGIC = b'\x1f\x8b'
+    
+    # Metadata of every saved macro, keyed by file name
+    INDEX_FILE = "_index.json"
+    LOCK_FILE = ".lock"
+    
+    # Threads reading macro files in parallel when the index is rebuilt
+    SCAN_WORKERS = 8
+    
+    # Parsed macros kept for replay without touching the file again
+    LOAD_CACHE_SIZE = 8
+    
     def __init__(self, macros_dir: str = "macros"):
         self.macros_dir = Path(macros_dir)
         self.macros_dir.mkdir(exist_ok=True)
+        self._index_path = self.macros_dir / self.INDEX_FILE
+        self._lock_path = self.macros_dir / self.LOCK_FILE
+        self._thread_lock = threading.Lock()
+        # (macros dir mtime_ns, listing) from the last list_macros call
+        self._list_cache: Optional[Tuple[int, List[Dict[str, Any]]]] = None
+        # name -> (file mtime_ns, parsed macro)
+        self._load_cache: Dict[str, Tuple[int, Dict[str, Any]]] = {}
     
-    def save_macro(self, name: str, events: List[Dict[str, Any]], description: str = ""):
+    def save_macro(self, name: str, events: List[Dict[str, Any]], description: str = "",
+                   created: Optional[str] = None):
         """Save macro to file"""
-        macro_data = {
+        table = EventTable.from_events(events)
+        header = {
             'name': name,
             'description': description,
-            'created': datetime.now().isoformat(),
-            'events': events
+            'created': created or datetime.now().isoformat(),
+            'events_count': len(table),
+            'keys': table.keys,
+            'buttons': table.buttons
         }
         
-        filename = f"{name}.json"
+        filename = f"{name}.mcr"
         filepath = self.macros_dir / filename
         
-        with open(filepath, 'w') as f:
-            json.dump(macro_data, f, indent=2)
+        arrays = io.BytesIO()
+        if len(table) > self.COMPRESS_THRESHOLD:
+            np.savez_compressed(arrays, **table.columns)
+        else:
+            np.savez(arrays, **table.columns)
+        header_bytes = orjson.dumps(header)
+        payload = self.MCR_PREFIX.pack(self.MCR_MAGIC, len(header_bytes)) + header_bytes + arrays.getvalue()
+        
+        with self._locked():
+            self._atomic_write(filepath, payload)
+            index = self._load_index()
+            index[name] = self._metadata(header, name)
+            self._write_index(index)
+            self._cache_listing(index)
         
         return str(filepath)
     
@@ -369,602 +1002,598 @@ class MacroManager:
         name = f"macro_{timestamp}"
         
         # Add some context based on events
-        mouse_clicks = sum(1 for e in events if e['type'] == 'mouse_click' and e['pressed'])
-        key_presses = sum(1 for e in events if e['type'] == 'key_press')
-        duration = events[-1]['timestamp'] - events[0]['timestamp'] if len(events) > 1 else 0
+        table = EventTable.from_events(events)
+        types = table.columns['type']
+        mouse_clicks = int(np.count_nonzero((types == CLICK) & table.columns['pressed']))
+        key_presses = int(np.count_nonzero(types == KDOWN))
+        ts = table.columns['ts']
+        duration = (ts[-1] - ts[0]) / 1e9 if len(ts) > 1 else 0
         
         description = f"Auto-saved macro: {mouse_clicks} clicks, {key_presses} key presses, {duration:.1f}s duration"
         
-        return self.save_macro(name, events, description)
+        return self.save_macro(name, table, description)
     
     def load_macro(self, name: str) -> Optional[Dict[str, Any]]:
         """Load macro from file"""
-        filename = f"{name}.json"
-        filepath = self.macros_dir / filename
-        
-        if not filepath.exists():
+        filepath = self.find_macro_file(name)
+        if filepath is None:
             return None
         
-        with open(filepath, 'r') as f:
-            return json.load(f)
+        if filepath.suffix == '.mcr':
+            mtime = filepath.stat().st_mtime_ns
+            cached = self._load_cache.get(name)
+            if cached is not None and cached[0] == mtime:
+                return cached[1]
+            
+            macro_data = self._read_mcr_file(filepath)
+            if len(self._load_cache) >= self.LOAD_CACHE_SIZE:
+                self._load_cache.clear()
+            self._load_cache[name] = (mtime, macro_data)
+            return macro_data
+        
+        macro_data = self._read_json_file(filepath)
+        self._convert_legacy(filepath, macro_data)
+        return macro_data
+    
+    def _convert_legacy(self, filepath: Path, macro_data: Dict[str, Any]):
+        """Write a binary copy of a legacy JSON macro so later loads skip JSON.
+        The JSON is kept as the lossless original; the .mcr takes precedence."""
+        try:
+            self.save_macro(filepath.stem, macro_data.get('events', []),
+                            macro_data.get('description', ''), macro_data.get('created'))
+        except Exception as e:
+            print(f"Could not convert {filepath} to the binary format: {e}")
+    
+    def _candidate_files(self, name: str) -> List[Path]:
+        """The files a macro name may be stored in, binary first. The index
+        file is never one of them."""
+        filepaths = [self.macros_dir / f"{name}{suffix}" for suffix in ('.mcr', '.json')]
+        return [filepath for filepath in filepaths if filepath != self._index_path]
+    
+    def find_macro_file(self, name: str) -> Optional[Path]:
+        """Locate a macro's file, preferring the binary format over legacy JSON"""
+        for filepath in self._candidate_files(name):
+            if filepath.exists():
+                return filepath
+        return None
+    
+    def _read_mcr_header(self, data: bytes) -> tuple:
+        """Split a binary macro file into its header and the offset of the columns"""
+        magic, header_len = self.MCR_PREFIX.unpack_from(data)
+        if magic != self.MCR_MAGIC:
+            raise ValueError("Not a macro file")
+        start = self.MCR_PREFIX.size
+        return orjson.loads(data[start:start + header_len]), start + header_len
+    
+    def _read_mcr_file(self, filepath: Path) -> Dict[str, Any]:
+        """Parse a binary macro file; events are decoded to dicts on iteration"""
+        data = filepath.read_bytes()
+        header, offset = self._read_mcr_header(data)
+        with np.load(io.BytesIO(data[offset:])) as arrays:
+            count = header['events_count']
+            # Files written before a column existed get it zero-filled
+            columns = {name: arrays[name] if name in arrays.files else np.zeros(count, dtype)
+                       for name, dtype in COLUMNS.items()}
+        
+        macro_data = {key: header[key] for key in ('name', 'description', 'created')}
+        macro_data['events'] = EventTable(columns, header['keys'], header['buttons'])
+        return macro_data
+    
+    def _read_json_file(self, filepath: Path) -> Dict[str, Any]:
+        """Parse a legacy macro file, plain or gzip-compressed JSON"""
+        data = filepath.read_bytes()
+        if data[:2] == self.GZIP_MAGIC:
+            data = gzip.decompress(data)
+        return orjson.loads(data)
     
     def list_macros(self) -> List[Dict[str, str]]:
         """List all available macros"""
-        macros = []
-        for filepath in self.macros_dir.glob("*.json"):
-            try:
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    macros.append({
-                        'name': data.get('name', filepath.stem),
-                        'description': data.get('description', ''),
-                        'created': data.get('created', 'Unknown'),
-                        'events_count': len(data.get('events', []))
-                    })
-            except Exception as e:
-                print(f"Error reading macro {filepath}: {e}")
+        # Adding, removing or renaming a file in the directory bumps its mtime.
+        # While it is unchanged the last listing is still current; otherwise
+        # the index is checked against the files before listing again.
+        mtime = self.macros_dir.stat().st_mtime_ns
+        cached = self._list_cache
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
         
+        with self._locked():
+            index = self._load_index()
+            if self._sync_index(index):
+                self._write_index(index)
+            return self._cache_listing(index)
+    
+    def _cache_listing(self, index: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Remember the listing of an index that matches the directory. Called
+        under the lock after our own writes, so only outside changes to the
+        directory make list_macros rescan it."""
+        macros = list(index.values())
+        self._list_cache = (self.macros_dir.stat().st_mtime_ns, macros)
         return macros
     
     def delete_macro(self, name: str) -> bool:
         """Delete a macro file"""
-        filename = f"{name}.json"
-        filepath = self.macros_dir / filename
+        deleted = False
+        with self._locked():
+            for filepath in self._candidate_files(name):
+                if filepath.exists():
+                    filepath.unlink()
+                    deleted = True
+            
+            if deleted:
+                index = self._load_index()
+                index.pop(name, None)
+                self._write_index(index)
+                self._cache_listing(index)
+                self._load_cache.pop(name, None)
+        return deleted
+    
+    @contextmanager
+    def _locked(self):
+        """Serialize access to the macro files across threads and, where
+        flock is available, across processes"""
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, 'wb') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _atomic_write(self, filepath: Path, payload: bytes):
+        """Write a file via a synced temp file so readers never see a partial write"""
+        tmp_path = filepath.with_name(filepath.name + '.tmp')
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, filepath)
+    
+    def _metadata(self, data: Dict[str, Any], default_name: str) -> Dict[str, Any]:
+        """Build the index entry for a macro header or legacy JSON document"""
+        return {
+            'name': data.get('name', default_name),
+            'description': data.get('description', ''),
+            'created': data.get('created', 'Unknown'),
+            'events_count': data['events_count'] if 'events_count' in data else len(data.get('events', []))
+        }
+    
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        """Read the metadata index, rebuilding it if missing or unreadable"""
+        try:
+            return orjson.loads(self._index_path.read_bytes())
+        except (FileNotFoundError, orjson.JSONDecodeError):
+            index = self._rebuild_index()
+            self._write_index(index)
+            return index
+    
+    def _write_index(self, index: Dict[str, Dict[str, Any]]):
+        """Atomically replace the metadata index"""
+        self._atomic_write(self._index_path, orjson.dumps(index))
+    
+    def _rebuild_index(self) -> Dict[str, Dict[str, Any]]:
+        """Scan every macro file to build the metadata index"""
+        return self._read_entries(list(self._macro_files().values()))
+    
+    def _sync_index(self, index: Dict[str, Dict[str, Any]]) -> bool:
+        """Bring the index in line with files added to or removed from the
+        macros directory outside the app. Returns whether it changed."""
+        files = self._macro_files()
+        gone = [name for name in index if name not in files]
+        for name in gone:
+            del index[name]
+        added = self._read_entries([filepath for name, filepath in files.items() if name not in index])
+        index.update(added)
+        return bool(gone or added)
+    
+    def _macro_files(self) -> Dict[str, Path]:
+        """Map each macro name to its file, preferring binary over legacy JSON"""
+        files = {}
+        # Binary files go last so they win over a legacy JSON of the same name
+        for filepath in [*self.macros_dir.glob("*.json"), *self.macros_dir.glob("*.mcr")]:
+            if filepath != self._index_path:
+                files[filepath.stem] = filepath
+        return files
+    
+    def _read_entries(self, filepaths: List[Path]) -> Dict[str, Dict[str, Any]]:
+        """Read the index entries of several macro files in parallel"""
+        if not filepaths:
+            return {}
+        
+        # File reads release the GIL, so a few threads keep several in flight
+        with ThreadPoolExecutor(max_workers=min(self.SCAN_WORKERS, len(filepaths))) as pool:
+            entries = list(pool.map(self._read_metadata, filepaths))
         
-        if filepath.exists():
-            filepath.unlink()
-            return True
-        return False
+        return {filepath.stem: entry for filepath, entry in zip(filepaths, entries) if entry is not None}
+    
+    def _read_metadata(self, filepath: Path) -> Optional[Dict[str, Any]]:
+        """Read one macro file's index entry, reading only the header of binary files"""
+        try:
+            if filepath.suffix == '.mcr':
+                with open(filepath, 'rb') as f:
+                    prefix = f.read(self.MCR_PREFIX.size)
+                    _, header_len = self.MCR_PREFIX.unpack(prefix)
+                    data, _ = self._read_mcr_header(prefix + f.read(header_len))
+            else:
+                data = self._read_json_file(filepath)
+            return self._metadata(data, filepath.stem)
+        except Exception as e:
+            print(f"Error reading macro {filepath}: {e}")
+            return None
+
+def _column_views(buffer, capacity: int) -> Dict[str, np.ndarray]:
+    """Lay out one array per event column over a shared buffer"""
+    views = {}
+    offset = 0
+    for name, dtype in COLUMNS.items():
+        views[name] = np.ndarray(capacity, dtype=dtype, buffer=buffer, offset=offset)
+        # Keep every column 8-byte aligned
+        offset += -(-capacity * np.dtype(dtype).itemsize // 8) * 8
+    return views
+
+def _column_bytes(capacity: int) -> int:
+    """Size of the shared buffer _column_views needs for capacity rows"""
+    return sum(-(-capacity * np.dtype(dtype).itemsize // 8) * 8 for dtype in COLUMNS.values())
+
+def _engine_main(conn, shared_count, shared_recording, count_changed):
+    """Run the recorder and player, serving commands from the web process"""
+    # Ctrl+C reaches the whole process group; the web process shuts us down
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    recorder = MacroRecorder(count_changed=count_changed, shared_count=shared_count)
+    player = MacroPlayer()
+    
+    def export_table(shm_name: str, capacity: int):
+        # Copy the recorded columns straight into the caller's shared memory
+        shm = SharedMemory(name=shm_name)
+        try:
+            views = _column_views(shm.buf, capacity)
+            events = recorder.get_events()
+            n = min(capacity, recorder.get_event_count())
+            for name, view in views.items():
+                view[:n] = events[name][:n]
+            del views
+        finally:
+            shm.close()
+        return n, recorder.get_key_names()
+    
+    handlers = {
+        'start_recording': recorder.start_recording,
+        'stop_recording': recorder.stop_recording,
+        'export_table': export_table,
+        'play_macro': player.play_macro,
+        'play_macro_loop': player.play_macro_loop,
+        'stop_playback': player.stop_playback,
+    }
+    
+    while True:
+        try:
+            command, args = conn.recv()
+        except EOFError:
+            break
+        try:
+            reply = ('ok', handlers[command](*args))
+        except Exception as e:
+            reply = ('error', f"{type(e).__name__}: {e}")
+        shared_recording.value = recorder.recording
+        conn.send(reply)
+    
+    recorder.stop_recording()
+    player.stop_playback()
+
+class MacroEngine:
+    """Runs recording and playback in a child process so Flask requests
+    never compete with the input callbacks for the GIL"""
+    
+    def __init__(self):
+        self._process = None
+        self._conn = None
+        self._lock = threading.Lock()
+        self.count = None
+        self.recording = None
+        self.count_changed = None
+    
+    def _start(self):
+        """Spawn the engine process on first use"""
+        ctx = mp.get_context('spawn')
+        self.count = ctx.RawValue('q', 0)
+        self.recording = ctx.RawValue('b', 0)
+        self.count_changed = ctx.Event()
+        self._conn, child_conn = ctx.Pipe()
+        self._process = ctx.Process(
+            target=_engine_main,
+            args=(child_conn, self.count, self.recording, self.count_changed),
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+    
+    def call(self, command: str, *args):
+        """Run a command in the engine process and return its result"""
+        with self._lock:
+            if self._process is None:
+                self._start()
+            self._conn.send((command, args))
+            status, result = self._conn.recv()
+        if status == 'error':
+            raise RuntimeError(result)
+        return result
+
+class RecorderClient:
+    """MacroRecorder interface backed by the engine process"""
+    
+    def __init__(self, engine: MacroEngine):
+        self._engine = engine
+    
+    @property
+    def recording(self) -> bool:
+        return bool(self._engine.recording and self._engine.recording.value)
+    
+    def start_recording(self):
+        return self._engine.call('start_recording')
+    
+    def stop_recording(self):
+        if self._engine.recording is None:
+            return False
+        return self._engine.call('stop_recording')
+    
+    def get_event_count(self) -> int:
+        return self._engine.count.value if self._engine.count else 0
+    
+    def wait_for_count_change(self, timeout: float = 1.0) -> int:
+        if self._engine.count_changed is None:
+            time.sleep(timeout)
+        else:
+            self._engine.count_changed.wait(timeout)
+            self._engine.count_changed.clear()
+        return self.get_event_count()
+    
+    def get_table(self) -> EventTable:
+        """Copy the recorded columns out of the engine through shared memory"""
+        if self._engine.recording is None:
+            return EventTable.from_events([])
+        capacity = self.get_event_count()
+        shm = SharedMemory(create=True, size=max(_column_bytes(capacity), 1))
+        try:
+            n, keys = self._engine.call('export_table', shm.name, capacity)
+            views = _column_views(shm.buf, capacity)
+            columns = {name: view[:n].copy() for name, view in views.items()}
+            del views
+        finally:
+            shm.close()
+            shm.unlink()
+        return EventTable(columns, keys, BUTTON_NAMES)
+
+class PlayerClient:
+    """MacroPlayer interface backed by the engine process"""
+    
+    def __init__(self, engine: MacroEngine):
+        self._engine = engine
+    
+    def play_macro(self, events: List[Dict[str, Any]], speed: float = 1.0, repeat: int = 1):
+        return self._engine.call('play_macro', events, speed, repeat)
+    
+    def play_macro_loop(self, events: List[Dict[str, Any]], speed: float = 1.0, delay_between_loops: float = 1.0):
+        return self._engine.call('play_macro_loop', events, speed, delay_between_loops)
+    
+    def stop_playback(self):
+        if self._engine.recording is None:
+            return
+        self._engine.call('stop_playback')
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider that encodes and decodes with orjson"""
+    
+    @staticmethod
+    def default(o: Any) -> Any:
+        """Encode an EventTable as its columns; numpy arrays need no conversion"""
+        if isinstance(o, EventTable):
+            return o.to_columns()
+        return DefaultJSONProvider.default(o)
+    
+    def _options(self, pretty: bool = False) -> int:
+        option = orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if pretty:
+            option |= orjson.OPT_INDENT_2
+        return option
+    
+    def dumps(self, obj: Any, **kwargs) -> str:
+        return orjson.dumps(obj, default=self.default, option=self._options()).decode()
+    
+    def loads(self, s, **kwargs) -> Any:
+        return orjson.loads(s)
+    
+    def response(self, *args, **kwargs) -> Response:
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = self.compact is False or (self.compact is None and self._app.debug)
+        # Hand orjson's bytes straight to the response, skipping the str round-trip
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=self._options(pretty)),
+            mimetype=self.mimetype)
 
 # Flask Web Application
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
+# No per-dict key sorting or indentation on the large event payloads
+app.json.sort_keys = False
+app.json.compact = True
+# Let a fronting server (e.g. Apache mod_xsendfile) stream macro downloads
+app.use_x_sendfile = os.environ.get('USE_X_SENDFILE') == '1'
 
-# Global instances
-recorder = MacroRecorder()
-player = MacroPlayer()
-manager = MacroManager()
-
-# HTML Template
-HTML_TEMPLATE = """
-<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>Macro Recorder</title>
-    <style>
-        body {
-            font-family: Arial, sans-serif;
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 20px;
-            background-color: #f5f5f5;
-        }
-        .container {
-            background: white;
-            border-radius: 10px;
-            padding: 30px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }
-        h1 {
-            color: #333;
-            text-align: center;
-            margin-bottom: 30px;
-        }
-        .section {
-            margin-bottom: 30px;
-            padding: 20px;
-            border: 1px solid #ddd;
-            border-radius: 8px;
-        }
-        .section h2 {
-            margin-top: 0;
-            color: #555;
-        }
-        .controls {
-            display: flex;
-            gap: 10px;
-            margin-bottom: 20px;
-            flex-wrap: wrap;
-        }
-        button {
-            padding: 12px 24px;
-            border: none;
-            border-radius: 5px;
-            cursor: pointer;
-            font-size: 16px;
-            transition: background-color 0.3s;
-        }
-        .btn-primary {
-            background-color: #007bff;
-            color: white;
-        }
-        .btn-primary:hover {
-            background-color: #0056b3;
-        }
-        .btn-danger {
-            background-color: #dc3545;
-            color: white;
-        }
-        .btn-danger:hover {
-            background-color: #c82333;
-        }
-        .btn-success {
-            background-color: #28a745;
-            color: white;
-        }
-        .btn-success:hover {
-            background-color: #218838;
-        }
-        .btn-warning {
-            background-color: #ffc107;
-            color: black;
-        }
-        .btn-warning:hover {
-            background-color: #e0a800;
-        }
-        .status {
-            padding: 10px;
-            margin: 10px 0;
-            border-radius: 5px;
-            font-weight: bold;
-        }
-        .status.recording {
-            background-color: #d4edda;
-            color: #155724;
-            border: 1px solid #c3e6cb;
-        }
-        .status.stopped {
-            background-color: #f8d7da;
-            color: #721c24;
-            border: 1px solid #f5c6cb;
-        }
-        .status.playing {
-            background-color: #fff3cd;
-            color: #856404;
-            border: 1px solid #ffeaa7;
-        }
-        input, select {
-            padding: 8px;
-            margin: 5px;
-            border: 1px solid #ddd;
-            border-radius: 4px;
-        }
-        .macro-list {
-            max-height: 300px;
-            overflow-y: auto;
-            border: 1px solid #ddd;
-            border-radius: 5px;
-        }
-        .macro-item {
-            padding: 15px;
-            border-bottom: 1px solid #eee;
-            display: flex;
-            justify-content: between;
-            align-items: center;
-        }
-        .macro-item:last-child {
-            border-bottom: none;
-        }
-        .macro-info {
-            flex-grow: 1;
-        }
-        .macro-name {
-            font-weight: bold;
-            color: #333;
-        }
-        .macro-details {
-            font-size: 12px;
-            color: #666;
-            margin-top: 5px;
-        }
-        .macro-actions {
-            display: flex;
-            gap: 5px;
-        }
-        .form-group {
-            margin-bottom: 15px;
-        }
-        label {
-            display: block;
-            margin-bottom: 5px;
-            font-weight: bold;
-        }
-        .hidden {
-            display: none;
-        }
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>🖱️ Macro Recorder & Player</h1>
-        
-        <!-- Recording Section -->
-        <div class="section">
-            <h2>📹 Recording</h2>
-            <div id="status" class="status stopped">Ready to record</div>
-            <div class="controls">
-                <button id="startBtn" class="btn-success" onclick="startRecording()">▶️ Start Recording</button>
-                <button id="stopBtn" class="btn-danger" onclick="stopRecording()" disabled>⏹️ Stop Recording</button>
-                <button id="clearBtn" class="btn-warning" onclick="clearRecording()">🗑️ Clear</button>
-            </div>
-            <div id="eventCount">Events recorded: 0</div>
-            <div id="autoSaveStatus" class="hidden" style="margin-top: 10px; padding: 8px; background-color: #d1ecf1; color: #0c5460; border-radius: 4px;">
-                ✅ Macro automatically saved!
-            </div>
-        </div>
-        
-        <!-- Manual Save Section (Optional) -->
-        <div class="section" id="saveSection" style="display: none;">
-            <h2>💾 Manual Save (Optional)</h2>
-            <p style="color: #666; font-size: 14px;">Macros are auto-saved, but you can rename them here if needed:</p>
-            <div class="form-group">
-                <label for="macroName">Custom Name:</label>
-                <input type="text" id="macroName" placeholder="Enter custom name (optional)">
-            </div>
-            <div class="form-group">
-                <label for="macroDescription">Description:</label>
-                <input type="text" id="macroDescription" placeholder="Enter description (optional)">
-            </div>
-            <button class="btn-primary" onclick="saveMacro()">💾 Save with Custom Name</button>
-        </div>
-        
-        <!-- Playback Section -->
-        <div class="section">
-            <h2>▶️ Playback</h2>
-            <div class="controls">
-                <label for="speedSelect">Speed:</label>
-                <select id="speedSelect">
-                    <option value="0.5">0.5x (Slow)</option>
-                    <option value="1.0" selected>1.0x (Normal)</option>
-                    <option value="1.5">1.5x (Fast)</option>
-                    <option value="2.0">2.0x (Very Fast)</option>
-                </select>
-                
-                <label for="repeatCount">Repeat:</label>
-                <input type="number" id="repeatCount" value="1" min="1" max="100" style="width: 60px;">
-                
-                <label for="loopDelay">Loop Delay (s):</label>
-                <input type="number" id="loopDelay" value="1" min="0" max="10" step="0.5" style="width: 70px;">
-                
-                <button class="btn-primary" onclick="playCurrentMacro()">▶️ Play Current</button>
-                <button class="btn-success" onclick="playCurrentMacroLoop()">🔄 Loop Current</button>
-                <button class="btn-danger" onclick="stopPlayback()">⏹️ Stop Playback</button>
-            </div>
-            <div id="loopStatus" class="hidden" style="margin-top: 10px; padding: 8px; background-color: #fff3cd; color: #856404; border-radius: 4px;">
-                🔄 Loop playing... Press <strong>Ctrl+S</strong> or <strong>ESC</strong> to stop
-            </div>
-        </div>
-        
-        <!-- Macro Library -->
-        <div class="section">
-            <h2>📚 Macro Library</h2>
-            <button class="btn-primary" onclick="refreshMacros()">🔄 Refresh</button>
-            <div id="macroList" class="macro-list">
-                <!-- Macros will be loaded here -->
-            </div>
-        </div>
-    </div>
-
-    <script>
-        let currentEvents = [];
-        let recordingInterval;
-        
-        // Start recording
-        async function startRecording() {
-            const response = await fetch('/start_recording', { method: 'POST' });
-            const result = await response.json();
-            
-            if (result.success) {
-                document.getElementById('status').textContent = 'Recording... Click Stop when done';
-                document.getElementById('status').className = 'status recording';
-                document.getElementById('startBtn').disabled = true;
-                document.getElementById('stopBtn').disabled = false;
-                
-                // Start polling for event count
-                recordingInterval = setInterval(updateEventCount, 500);
-            }
-        }
-        
-        // Stop recording
-        async function stopRecording() {
-            const response = await fetch('/stop_recording', { method: 'POST' });
-            const result = await response.json();
-            
-            if (result.success) {
-                currentEvents = result.events;
-                const eventCount = result.events.length;
-                
-                if (result.auto_saved && eventCount > 0) {
-                    document.getElementById('status').textContent = `✅ Recording stopped & auto-saved! ${eventCount} events captured`;
-                    document.getElementById('status').className = 'status recording';
-                    
-                    // Show auto-save confirmation
-                    const autoSaveStatus = document.getElementById('autoSaveStatus');
-                    autoSaveStatus.classList.remove('hidden');
-                    setTimeout(() => {
-                        autoSaveStatus.classList.add('hidden');
-                    }, 5000);
-                    
-                    // Refresh macro list to show the new auto-saved macro
-                    refreshMacros();
-                } else {
-                    document.getElementById('status').textContent = `Recording stopped. ${eventCount} events captured`;
-                    document.getElementById('status').className = 'status stopped';
-                }
-                
-                document.getElementById('startBtn').disabled = false;
-                document.getElementById('stopBtn').disabled = true;
-                
-                // Show optional manual save section only if there are events
-                if (eventCount > 0) {
-                    document.getElementById('saveSection').style.display = 'block';
-                }
-                
-                clearInterval(recordingInterval);
-                updateEventCount();
-            }
-        }
-        
-        // Clear current recording
-        function clearRecording() {
-            currentEvents = [];
-            document.getElementById('eventCount').textContent = 'Events recorded: 0';
-            document.getElementById('saveSection').style.display = 'none';
-            document.getElementById('autoSaveStatus').classList.add('hidden');
-            document.getElementById('macroName').value = '';
-            document.getElementById('macroDescription').value = '';
-        }
-        
-        // Update event count
-        async function updateEventCount() {
-            try {
-                const response = await fetch('/get_event_count');
-                const result = await response.json();
-                document.getElementById('eventCount').textContent = `Events recorded: ${result.count}`;
-            } catch (error) {
-                console.error('Error updating event count:', error);
-            }
-        }
-        
-        // Save macro with custom name (optional)
-        async function saveMacro() {
-            const name = document.getElementById('macroName').value.trim();
-            const description = document.getElementById('macroDescription').value.trim();
-            
-            if (!name) {
-                alert('Please enter a custom macro name');
-                return;
-            }
-            
-            const response = await fetch('/save_macro', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    name: name,
-                    description: description,
-                    events: currentEvents
-                })
-            });
-            
-            const result = await response.json();
-            
-            if (result.success) {
-                alert('Custom macro saved successfully!');
-                document.getElementById('macroName').value = '';
-                document.getElementById('macroDescription').value = '';
-                refreshMacros();
-            } else {
-                alert('Error saving macro: ' + result.error);
-            }
-        }
-        
-        // Play current macro
-        async function playCurrentMacro() {
-            if (currentEvents.length === 0) {
-                alert('No events to play. Record a macro first.');
-                return;
-            }
-            
-            const speed = parseFloat(document.getElementById('speedSelect').value);
-            const repeat = parseInt(document.getElementById('repeatCount').value);
-            
-            const response = await fetch('/play_macro', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    events: currentEvents,
-                    speed: speed,
-                    repeat: repeat
-                })
-            });
-            
-            const result = await response.json();
-            
-            if (result.success) {
-                document.getElementById('status').textContent = 'Playing macro...';
-                document.getElementById('status').className = 'status playing';
-            } else {
-                alert('Error playing macro: ' + result.error);
-            }
-        }
-        
-        // Play current macro in loop
-        async function playCurrentMacroLoop() {
-            if (currentEvents.length === 0) {
-                alert('No events to play. Record a macro first.');
-                return;
-            }
-            
-            const speed = parseFloat(document.getElementById('speedSelect').value);
-            const delay = parseFloat(document.getElementById('loopDelay').value);
-            
-            const response = await fetch('/play_macro_loop', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    events: currentEvents,
-                    speed: speed,
-                    delay: delay
-                })
-            });
-            
-            const result = await response.json();
-            
-            if (result.success) {
-                document.getElementById('status').textContent = 'Playing macro in loop... Press Ctrl+S to stop';
-                document.getElementById('status').className = 'status playing';
-                document.getElementById('loopStatus').classList.remove('hidden');
-            } else {
-                alert('Error playing macro loop: ' + result.error);
-            }
-        }
-        
-        // Stop playback
-        async function stopPlayback() {
-            const response = await fetch('/stop_playback', { method: 'POST' });
-            const result = await response.json();
-            
-            if (result.success) {
-                document.getElementById('status').textContent = 'Playback stopped';
-                document.getElementById('status').className = 'status stopped';
-                document.getElementById('loopStatus').classList.add('hidden');
-            }
-        }
-        
-        // Play saved macro
-        async function playSavedMacro(name) {
-            const speed = parseFloat(document.getElementById('speedSelect').value);
-            const repeat = parseInt(document.getElementById('repeatCount').value);
-            
-            const response = await fetch('/play_saved_macro', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({
-                    name: name,
-                    speed: speed,
-                    repeat: repeat
-                })
-            });
-            
-            const result = await response.json();
-            
-            if (result.success) {
-                document.getElementById('status').textContent = `Playing macro: ${name}`;
-                document.getElementById('status').className = 'status playing';
-            } else {
-                alert('Error playing macro: ' + result.error);
-            }
-        }
-        
-        // Delete macro
-        async function deleteMacro(name) {
-            if (!confirm(`Are you sure you want to delete the macro "${name}"?`)) {
-                return;
-            }
-            
-            const response = await fetch('/delete_macro', {
-                method: 'POST',
-                headers: { 'Content-Type': 'application/json' },
-                body: JSON.stringify({ name: name })
-            });
-            
-            const result = await response.json();
-            
-            if (result.success) {
-                refreshMacros();
-            } else {
-                alert('Error deleting macro: ' + result.error);
-            }
-        }
-        
-        // Refresh macro list
-        async function refreshMacros() {
-            const response = await fetch('/list_macros');
-            const result = await response.json();
-            
-            const macroList = document.getElementById('macroList');
-            macroList.innerHTML = '';
-            
-            if (result.macros.length === 0) {
-                macroList.innerHTML = '<div class="macro-item">No saved macros found.</div>';
-                return;
-            }
-            
-            result.macros.forEach(macro => {
-                const item = document.createElement('div');
-                item.className = 'macro-item';
-                item.innerHTML = `
-                    <div class="macro-info">
-                        <div class="macro-name">${macro.name}</div>
-                        <div class="macro-details">
-                            ${macro.description ? macro.description + ' • ' : ''}
-                            ${macro.events_count} events • Created: ${new Date(macro.created).toLocaleDateString()}
-                        </div>
-                    </div>
-                    <div class="macro-actions">
-                        <button class="btn-primary" onclick="playSavedMacro('${macro.name}')">▶️ Play</button>
-                        <button class="btn-success" onclick="loopPlaySavedMacro('${macro.name}')">🔄 Loop</button>
-                        <button class="btn-danger" onclick="deleteMacro('${macro.name}')">🗑️</button>
-                    </div>
-                `;
-                macroList.appendChild(item);
-            });
-        }
-        
-        // Load macros on page load
-        window.onload = function() {
-            refreshMacros();
-        };
-    </script>
-</body>
-</html>
-"""
+# The engine process imports this module too but only runs _engine_main,
+# so the web-side state below is only set up in the web process
+WEB_PROCESS = mp.parent_process() is None
+
+# Global instances; recording and playback run in the engine process
+if WEB_PROCESS:
+    engine = MacroEngine()
+    recorder = RecorderClient(engine)
+    player = PlayerClient(engine)
+    manager = MacroManager()
+
+# Auto-saves are written by a background thread so /stop_recording returns at once
+save_queue: 'queue.Queue[EventTable]' = queue.Queue()
+
+def _save_worker():
+    """Write queued recordings to disk"""
+    while True:
+        table = save_queue.get()
+        try:
+            filepath = manager.auto_save_macro(table)
+            print(f"✅ Macro auto-saved to: {filepath}")
+        except Exception as e:
+            print(f"❌ Auto-save failed: {e}")
+        finally:
+            save_queue.task_done()
+
+if WEB_PROCESS:
+    threading.Thread(target=_save_worker, daemon=True).start()
+
+# The page is a static file; a fronting server can serve it directly (see
+# README). When Flask serves it, it is read and compressed once at import.
+if WEB_PROCESS:
+    INDEX_HTML = (Path(app.static_folder) / 'index.html').read_bytes()
+    INDEX_HTML_GZ = gzip.compress(INDEX_HTML, 6)
+
+# Request bodies, decoded and validated in one pass
+EventsPayload = Union[List[Dict[str, Any]], Dict[str, Any]]
+Speed = Annotated[float, msgspec.Meta(gt=0)]
+RepeatCount = Annotated[int, msgspec.Meta(ge=1)]
+Delay = Annotated[float, msgspec.Meta(ge=0)]
+
+class SaveRequest(msgspec.Struct):
+    name: str = ''
+    description: str = ''
+    events: EventsPayload = []
+
+class PlayRequest(msgspec.Struct):
+    events: EventsPayload = []
+    speed: Speed = 1.0
+    repeat: RepeatCount = 1
+
+class PlaySavedRequest(msgspec.Struct):
+    name: str = ''
+    speed: Speed = 1.0
+    repeat: RepeatCount = 1
+
+class LoopRequest(msgspec.Struct):
+    events: EventsPayload = []
+    speed: Speed = 1.0
+    delay: Delay = 1.0
+
+class NameRequest(msgspec.Struct):
+    name: str = ''
+
+_DECODERS: Dict[type, msgspec.json.Decoder] = {}
+
+def _decode_request(struct_type: type):
+    """Decode the JSON request body into struct_type, without caching the raw bytes"""
+    decoder = _DECODERS.get(struct_type)
+    if decoder is None:
+        decoder = _DECODERS[struct_type] = msgspec.json.Decoder(struct_type)
+    return decoder.decode(request.get_data(cache=False) or b'{}')
+
+# Fixed bodies for the endpoints that take no input, so they skip jsonify
+OK_BODY = b'{"success":true}'
+FAIL_BODY = b'{"success":false}'
+
+def _json_body(body: bytes) -> Response:
+    return Response(body, mimetype='application/json')
 
 # Flask Routes
 @app.route('/')
 def index():
-    return render_template_string(HTML_TEMPLATE)
+    headers = {'Vary': 'Accept-Encoding'}
+    if request.accept_encodings['gzip']:
+        headers['Content-Encoding'] = 'gzip'
+        return Response(INDEX_HTML_GZ, mimetype='text/html', headers=headers)
+    return Response(INDEX_HTML, mimetype='text/html', headers=headers)
 
 @app.route('/start_recording', methods=['POST'])
 def start_recording():
     success = recorder.start_recording()
-    return jsonify({'success': success})
+    return _json_body(OK_BODY if success else FAIL_BODY)
 
 @app.route('/stop_recording', methods=['POST'])
-def stop_recording():
-    success = recorder.stop_recording()
+async def stop_recording():
+    success = await asyncio.to_thread(recorder.stop_recording)
+    table = await asyncio.to_thread(recorder.get_table) if success else None
+    events_count = len(table) if table else 0
     
-    if success and recorder.events:
-        # Auto-save the macro
-        try:
-            filepath = manager.auto_save_macro(recorder.events)
-            print(f"✅ Macro auto-saved to: {filepath}")
-        except Exception as e:
-            print(f"❌ Auto-save failed: {e}")
+    if events_count:
+        # Auto-save the macro in the background
+        save_queue.put(table)
     
+    # The events themselves are only sent when the page asks via /get_events
     return jsonify({
         'success': success,
-        'events': recorder.events if success else [],
-        'auto_saved': success and len(recorder.events) > 0
+        'events_count': events_count,
+        'auto_saved': events_count > 0
     })
 
+def _request_events(events: EventsPayload):
+    """Events from a request body, as dicts or in the columnar /get_events format"""
+    if isinstance(events, dict):
+        return EventTable.from_columns(events)
+    return events
+
+def _stream_events(events: Iterator[Dict[str, Any]], batch: int = 512) -> Iterator[bytes]:
+    """Encode {"events": [...]} a batch of events at a time"""
+    yield b'{"events":['
+    sep = b''
+    chunk = list(itertools.islice(events, batch))
+    while chunk:
+        # Strip the list brackets so batches splice into one array
+        yield sep + orjson.dumps(chunk)[1:-1]
+        sep = b','
+        chunk = list(itertools.islice(events, batch))
+    yield b']}'
+
+@app.route('/get_events')
+def get_events():
+    table = recorder.get_table()
+    if request.args.get('format') == 'columns':
+        # One array per column, encoded straight from the numpy buffers
+        return jsonify({'events': table})
+    
+    events = iter(table)
+    return Response(stream_with_context(_stream_events(events)), mimetype='application/json')
+
 @app.route('/get_event_count')
 def get_event_count():
-    return jsonify({'count': len(recorder.events)})
+    return _json_body(b'{"count":%d}' % recorder.get_event_count())
+
+@app.route('/events_stream')
+def events_stream():
+    def generate():
+        # Counts are pushed only when they change, as raw bytes
+        count = recorder.get_event_count()
+        yield b"data: %d\n\n" % count
+        while recorder.recording:
+            new_count = recorder.wait_for_count_change(timeout=1)
+            if new_count != count:
+                count = new_count
+                yield b"data: %d\n\n" % count
+        yield b"event: done\ndata: %d\n\n" % recorder.get_event_count()
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/save_macro', methods=['POST'])
-def save_macro():
+async def save_macro():
     try:
-        data = request.json
-        name = data.get('name', '').strip()
-        description = data.get('description', '').strip()
-        events = data.get('events', [])
+        req = _decode_request(SaveRequest)
+        name = req.name.strip()
+        description = req.description.strip()
+        events = _request_events(req.events)
         
         if not name:
             return jsonify({'success': False, 'error': 'Name is required'})
         
-        filepath = manager.save_macro(name, events, description)
+        filepath = await asyncio.to_thread(manager.save_macro, name, events, description)
         return jsonify({'success': True, 'filepath': filepath})
     
     except Exception as e:
@@ -973,12 +1602,10 @@ def save_macro():
 @app.route('/play_macro', methods=['POST'])
 def play_macro():
     try:
-        data = request.json
-        events = data.get('events', [])
-        speed = data.get('speed', 1.0)
-        repeat = data.get('repeat', 1)
+        req = _decode_request(PlayRequest)
+        events = _request_events(req.events)
         
-        success = player.play_macro(events, speed, repeat)
+        success = player.play_macro(events, req.speed, req.repeat)
         return jsonify({'success': success})
     
     except Exception as e:
@@ -987,16 +1614,13 @@ def play_macro():
 @app.route('/play_saved_macro', methods=['POST'])
 def play_saved_macro():
     try:
-        data = request.json
-        name = data.get('name', '')
-        speed = data.get('speed', 1.0)
-        repeat = data.get('repeat', 1)
+        req = _decode_request(PlaySavedRequest)
         
-        macro_data = manager.load_macro(name)
+        macro_data = manager.load_macro(req.name)
         if not macro_data:
             return jsonify({'success': False, 'error': 'Macro not found'})
         
-        success = player.play_macro(macro_data['events'], speed, repeat)
+        success = player.play_macro(macro_data['events'], req.speed, req.repeat)
         return jsonify({'success': success})
     
     except Exception as e:
@@ -1005,12 +1629,10 @@ def play_saved_macro():
 @app.route('/play_macro_loop', methods=['POST'])
 def play_macro_loop():
     try:
-        data = request.json
-        events = data.get('events', [])
-        speed = data.get('speed', 1.0)
-        delay = data.get('delay', 1.0)
+        req = _decode_request(LoopRequest)
+        events = _request_events(req.events)
         
-        success = player.play_macro_loop(events, speed, delay)
+        success = player.play_macro_loop(events, req.speed, req.delay)
         return jsonify({'success': success})
     
     except Exception as e:
@@ -1019,30 +1641,66 @@ def play_macro_loop():
 @app.route('/stop_playback', methods=['POST'])
 def stop_playback():
     player.stop_playback()
-    return jsonify({'success': True})
+    return _json_body(OK_BODY)
 
 @app.route('/list_macros')
-def list_macros():
-    macros = manager.list_macros()
+async def list_macros():
+    # Include recordings whose auto-save is still in flight
+    await asyncio.to_thread(save_queue.join)
+    macros = await asyncio.to_thread(manager.list_macros)
     return jsonify({'macros': macros})
 
+# (listing, rendered HTML) for /macros_html. MacroManager.list_macros hands
+# back the same list until the macros change, so identity marks staleness.
+_macros_html: Optional[Tuple[List[Dict[str, Any]], str]] = None
+
+@app.route('/macros_html')
+async def macros_html():
+    global _macros_html
+    await asyncio.to_thread(save_queue.join)
+    macros = await asyncio.to_thread(manager.list_macros)
+    cached = _macros_html
+    if cached is None or cached[0] is not macros:
+        cached = _macros_html = (macros, render_template('macro_list.html', macros=macros))
+    return Response(cached[1], mimetype='text/html')
+
+@app.route('/download_macro/<name>')
+def download_macro(name):
+    filepath = manager.find_macro_file(name)
+    if filepath is None:
+        return jsonify({'success': False, 'error': 'Macro not found'}), 404
+    
+    # Streamed from disk with conditional and range request support
+    return send_file(filepath.resolve(), mimetype='application/octet-stream',
+                     as_attachment=True, download_name=filepath.name, conditional=True)
+
 @app.route('/delete_macro', methods=['POST'])
-def delete_macro():
+async def delete_macro():
     try:
-        data = request.json
-        name = data.get('name', '')
+        req = _decode_request(NameRequest)
         
-        success = manager.delete_macro(name)
+        success = await asyncio.to_thread(manager.delete_macro, req.name)
         return jsonify({'success': success})
     
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)})
 
+def shutdown():
+    """Stop recording and playback and flush pending auto-saves"""
+    try:
+        recorder.stop_recording()
+        player.stop_playback()
+    except (EOFError, OSError):
+        pass  # The engine process was already signalled along with us
+    save_queue.join()
+
+# Runs on interpreter exit under the dev server and WSGI servers alike
+if WEB_PROCESS:
+    atexit.register(shutdown)
+
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully"""
     print("\nShutting down gracefully...")
-    recorder.stop_recording()
-    player.stop_playback()
     sys.exit(0)
 
 if __name__ == '__main__':
@@ -1051,7 +1709,7 @@ if __name__ == '__main__':
     
     print("🚀 Starting Macro Recorder Application")
     print("📝 Make sure to install required packages:")
-    print("   pip install flask pynput")
+    print("   pip install \"flask[async]\" pynput numpy orjson msgspec")
     print()
     print("🌐 Open your browser and go to: http://localhost:5000")
     print("⚠️  Note: This app requires appropriate permissions to record mouse/keyboard")
@@ -1059,7 +1717,8 @@ if __name__ == '__main__':
     print("📁 Auto-saved macros use timestamp names like: macro_20250702_143045")
     print("🔄 NEW: Loop Play feature - continuously repeat macros until Ctrl+S is pressed!")
     print("⌨️  Use Ctrl+S or ESC to stop loop playback")
+    print("🏭 For production, serve with: gunicorn -w 1 -k gthread --threads 8 -b 0.0.0.0:5000 app:app")
     print()
     
-    # Run Flask app
-    app.run(debug=False, host='0.0.0.0', port=5000)
\ No newline at end of file
+    # Run Flask app; the dev server handles each request on its own thread
+    app.run(debug=False, host='0.0.0.0', port=5000, threaded=True)
\ No newline at end of file